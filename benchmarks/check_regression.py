@@ -3,16 +3,28 @@ import json
 import os
 import sys
 
+try:
+    import orjson as fast_json
+except ImportError:  # optional faster JSON parser
+    try:
+        import ujson as fast_json
+    except ImportError:
+        fast_json = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 
 def read_json(path):
+    if fast_json is not None:
+        with open(path, "rb") as f:
+            return fast_json.loads(f.read())
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
 def main():
-    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    latest_path = os.path.join(root, "benchmarks", "latest_results.json")
-    limits_path = os.path.join(root, "benchmarks", "regression_thresholds.json")
+    latest_path = os.path.join(ROOT, "benchmarks", "latest_results.json")
+    limits_path = os.path.join(ROOT, "benchmarks", "regression_thresholds.json")
 
     if not os.path.exists(latest_path):
         print(f"missing benchmark results: {latest_path}")
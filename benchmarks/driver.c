@@ -0,0 +1,51 @@
+/* Native hot loop for the single-connection benchmarks.
+ *
+ * The Python client tops out on interpreter overhead (bytecode dispatch,
+ * attribute lookups) well before the server does. This keeps the timed
+ * send/recv loop in C; driver.py builds and loads it via ctypes.
+ *
+ * Works on any connected stream fd whose replies have a fixed total size
+ * per batch (SET/GET/PING against a primed key). Returns the number of
+ * completed batches; 0 on I/O error or if the fd goes away.
+ */
+#include <stdint.h>
+#include <time.h>
+#include <unistd.h>
+
+static uint64_t now_ns(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (uint64_t)ts.tv_sec * 1000000000ull + (uint64_t)ts.tv_nsec;
+}
+
+uint64_t run_fixed(int fd, const unsigned char *batch, size_t batch_len,
+                   size_t reply_bytes, uint64_t duration_ns) {
+    unsigned char buf[65536];
+    uint64_t deadline = now_ns() + duration_ns;
+    uint64_t iters = 0;
+
+    while (now_ns() < deadline) {
+        size_t off = 0;
+        while (off < batch_len) {
+            ssize_t n = write(fd, batch + off, batch_len - off);
+            if (n <= 0) {
+                return iters;
+            }
+            off += (size_t)n;
+        }
+        size_t got = 0;
+        while (got < reply_bytes) {
+            size_t chunk = reply_bytes - got;
+            if (chunk > sizeof(buf)) {
+                chunk = sizeof(buf);
+            }
+            ssize_t n = read(fd, buf, chunk);
+            if (n <= 0) {
+                return iters;
+            }
+            got += (size_t)n;
+        }
+        iters++;
+    }
+    return iters;
+}
@@ -1,69 +1,240 @@
 #!/usr/bin/env python3
 import json
 import os
+import signal
 import socket
 import subprocess
 import time
 from statistics import median
 
+# Number of in-flight commands per batch; 1 restores the old
+# send-one-wait-one behaviour for latency-style measurements.
+PIPELINE = max(int(os.environ.get("FEDIS_BENCH_PIPELINE", "64")), 1)
+
+# When set, attach to an already-running server instead of spawning one.
+EXTERNAL = os.environ.get("FEDIS_BENCH_EXTERNAL") == "1"
+
+# When set, benchmark over a Unix domain socket at this path instead
+# of loopback TCP; the server is launched with FEDIS_SOCK to match.
+BENCH_SOCK = os.environ.get("FEDIS_BENCH_SOCK")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+_LEN_CACHE = {}
+
+
+def _len_bytes(n):
+    b = _LEN_CACHE.get(n)
+    if b is None:
+        b = str(n).encode()
+        if n < 1024:
+            _LEN_CACHE[n] = b
+    return b
+
 
 def encode(parts):
-    out = f"*{len(parts)}\r\n".encode()
+    out = [b"*", _len_bytes(len(parts)), b"\r\n"]
     for p in parts:
         b = p if isinstance(p, bytes) else str(p).encode()
-        out += f"${len(b)}\r\n".encode() + b + b"\r\n"
-    return out
+        out.extend((b"$", _len_bytes(len(b)), b"\r\n", b, b"\r\n"))
+    return b"".join(out)
+
 
+def drain_replies(sock, buf, mv, want):
+    """Consume `want` RESP replies (+OK, -ERR, :int, or bulk string).
 
-def recv_one(sock):
-    sock.settimeout(2)
-    return sock.recv(1024)
+    A small state machine carries the parse position across reads: either
+    we are inside a header line (the short tail is kept in `header`) or we
+    are `skip` bytes into a bulk-string body. Each received byte is looked
+    at once and the receive buffer is never compacted.
+    """
+    seen = 0
+    skip = 0  # bytes of the current bulk body (plus CRLF) left to consume
+    header = b""  # partial header line carried over from the last read
+    while seen < want:
+        got = sock.recv_into(mv)
+        if not got:
+            raise RuntimeError("server closed connection mid-reply")
+        pos = 0
+        while pos < got and seen < want:
+            if skip:
+                step = min(skip, got - pos)
+                pos += step
+                skip -= step
+                if skip == 0:
+                    seen += 1
+                continue
+            if header[-1:] == b"\r" and buf[pos : pos + 1] == b"\n":
+                # CRLF split across two reads.
+                line = header[:-1]
+                header = b""
+                pos += 1
+            else:
+                end = buf.find(b"\r\n", pos, got)
+                if end < 0:
+                    header += buf[pos:got]
+                    break
+                line = header + buf[pos:end] if header else buf[pos:end]
+                header = b""
+                pos = end + 2
+            if line[:1] == b"$":
+                n = int(line[1:])
+                if n < 0:
+                    seen += 1  # null bulk has no body
+                else:
+                    skip = n + 2
+            else:
+                seen += 1
 
 
-def run_loop(sock, payload, duration_sec):
-    start = time.time()
+def recv_exactly(sock, mv, nbytes):
+    got = 0
+    while got < nbytes:
+        r = sock.recv_into(mv[got:nbytes])
+        if not r:
+            raise RuntimeError("server closed connection mid-reply")
+        got += r
+
+
+def run_loop(sock, payload, duration_sec, window=PIPELINE, reply_len=None):
+    batch = payload * window
+    buf = bytearray(max(65536, (reply_len or 0) * window))
+    mv = memoryview(buf)
+    # With a known fixed reply size the whole window is read as one
+    # exact byte count, no parsing; otherwise fall back to the counter.
+    expect = reply_len * window if reply_len is not None else None
+    # Check the clock roughly every 1024 ops, not on every iteration.
+    checks = max(1024 // window, 1)
+    start = time.perf_counter()
+    deadline = start + duration_sec
     n = 0
-    while time.time() - start < duration_sec:
-        sock.sendall(payload)
-        recv_one(sock)
-        n += 1
-    elapsed = time.time() - start
+    while True:
+        for _ in range(checks):
+            sock.sendall(batch)
+            if expect is not None:
+                recv_exactly(sock, mv, expect)
+            else:
+                drain_replies(sock, buf, mv, window)
+        n += checks * window
+        if time.perf_counter() >= deadline:
+            break
+    elapsed = time.perf_counter() - start
     return n / max(elapsed, 0.001)
 
 
+def tune_socket(s):
+    # Nagle plus delayed ACKs stalls pipelined batches for ~40ms per
+    # window; large buffers keep whole batches from blocking in flight.
+    if s.family != socket.AF_UNIX:
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+
+
+def connect(port, timeout=2):
+    if BENCH_SOCK:
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(timeout)
+        s.connect(BENCH_SOCK)
+    else:
+        s = socket.create_connection(("127.0.0.1", port), timeout=timeout)
+    tune_socket(s)
+    return s
+
+
+def parse_cores(spec):
+    """Parse a core list like "0,2" or "4-7" into a set of ints."""
+    cores = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cores.update(range(int(lo), int(hi) + 1))
+        else:
+            cores.add(int(part))
+    return cores
+
+
+def set_affinity(pid, spec):
+    """Pin `pid` (0 = this process) to the cores in `spec`, if given."""
+    if not spec:
+        return
+    try:
+        os.sched_setaffinity(pid, parse_cores(spec))
+    except (AttributeError, OSError):
+        pass  # not supported on this platform
+
+
 def wait_conn(port):
     for _ in range(80):
         try:
-            return socket.create_connection(("127.0.0.1", port), timeout=0.2)
+            return connect(port, timeout=0.2)
         except OSError:
             time.sleep(0.1)
     raise RuntimeError("server did not start")
 
 
+def stop_server(pid):
+    os.kill(pid, signal.SIGTERM)
+    for _ in range(20):
+        done, _ = os.waitpid(pid, os.WNOHANG)
+        if done:
+            return
+        time.sleep(0.1)
+    os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+
+
 def main():
-    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    with open(os.path.join(root, "benchmarks", "thresholds.json"), "r", encoding="utf-8") as f:
+    set_affinity(0, os.environ.get("FEDIS_BENCH_CLIENT_CORES") or os.environ.get("FEDIS_BENCH_AFFINITY"))
+    with open(os.path.join(ROOT, "benchmarks", "thresholds.json"), "r", encoding="utf-8") as f:
         thresholds = json.load(f)
 
-    port = 6410
+    port = int(os.environ.get("FEDIS_BENCH_PORT", "6410"))
     env = os.environ.copy()
     env["FEDIS_PORT"] = str(port)
     env.setdefault("FEDIS_LOG", "error")
+    if BENCH_SOCK:
+        env["FEDIS_SOCK"] = BENCH_SOCK
 
-    proc = subprocess.Popen(["cargo", "run", "--quiet"], cwd=root, env=env)
+    if EXTERNAL:
+        # Attach to an already-running server (see serve.py).
+        pid = None
+    else:
+        # Debug builds are 10-50x slower than release and would measure
+        # the wrong binary; build once, then posix_spawn the binary so
+        # neither cargo nor Popen's fork machinery is on the startup path.
+        subprocess.run(["cargo", "build", "--release", "--quiet"], cwd=ROOT, check=True)
+        bin_path = os.path.join(ROOT, "target", "release", "fedis")
+        pid = os.posix_spawn(bin_path, [bin_path], env)
+        set_affinity(pid, os.environ.get("FEDIS_BENCH_SERVER_CORES"))
     try:
         sock = wait_conn(port)
+        sock.settimeout(2)
         sock.sendall(encode(["SET", "bench:key", "0"]))
-        recv_one(sock)
+        sock.recv_into(memoryview(bytearray(1024)))
 
         set_payload = encode(["SET", "bench:key", "123"])
         get_payload = encode(["GET", "bench:key"])
+        # Both replies have a fixed size once the key holds "123":
+        # SET answers +OK\r\n and GET answers $3\r\n123\r\n.
+        set_reply_len = len(b"+OK\r\n")
+        get_reply_len = len(b"$3\r\n123\r\n")
 
-        run_loop(sock, set_payload, 0.4)
-        run_loop(sock, get_payload, 0.4)
+        run_loop(sock, set_payload, 0.4, reply_len=set_reply_len)
+        run_loop(sock, get_payload, 0.4, reply_len=get_reply_len)
 
-        set_samples = [run_loop(sock, set_payload, thresholds["duration_sec"]) for _ in range(3)]
-        get_samples = [run_loop(sock, get_payload, thresholds["duration_sec"]) for _ in range(3)]
+        set_samples = [
+            run_loop(sock, set_payload, thresholds["duration_sec"], reply_len=set_reply_len)
+            for _ in range(3)
+        ]
+        get_samples = [
+            run_loop(sock, get_payload, thresholds["duration_sec"], reply_len=get_reply_len)
+            for _ in range(3)
+        ]
         set_ops = median(set_samples)
         get_ops = median(get_samples)
         sock.close()
@@ -86,11 +257,8 @@ def main():
                 print(line)
             raise SystemExit(1)
     finally:
-        proc.terminate()
-        try:
-            proc.wait(timeout=2)
-        except subprocess.TimeoutExpired:
-            proc.kill()
+        if pid is not None:
+            stop_server(pid)
 
 
 if __name__ == "__main__":
@@ -1,64 +1,214 @@
 #!/usr/bin/env python3
+import asyncio
 import os
+import signal
 import socket
 import subprocess
-import threading
 import time
 
+try:
+    import uvloop
+except ImportError:  # optional event-loop accelerator
+    uvloop = None
+
+# Number of in-flight commands per connection; 1 restores the old
+# send-one-wait-one behaviour for latency-style measurements.
+PIPELINE = max(int(os.environ.get("FEDIS_BENCH_PIPELINE", "64")), 1)
+
+# Number of real connections the logical clients are multiplexed over;
+# a handful of pooled connections usually beats one per client because
+# the server tracks less TCP/accept state.
+CONNS = int(os.environ.get("FEDIS_BENCH_CONNS", "0"))
+
+# When set, attach to an already-running server instead of spawning one.
+EXTERNAL = os.environ.get("FEDIS_BENCH_EXTERNAL") == "1"
+
+# When set, benchmark over a Unix domain socket at this path instead
+# of loopback TCP; the server is launched with FEDIS_SOCK to match.
+BENCH_SOCK = os.environ.get("FEDIS_BENCH_SOCK")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+_LEN_CACHE = {}
+
+
+def _len_bytes(n):
+    b = _LEN_CACHE.get(n)
+    if b is None:
+        b = str(n).encode()
+        if n < 1024:
+            _LEN_CACHE[n] = b
+    return b
+
 
 def encode(parts):
-    out = f"*{len(parts)}\r\n".encode()
+    out = [b"*", _len_bytes(len(parts)), b"\r\n"]
     for p in parts:
         b = p if isinstance(p, bytes) else str(p).encode()
-        out += f"${len(b)}\r\n".encode() + b + b"\r\n"
-    return out
+        out.extend((b"$", _len_bytes(len(b)), b"\r\n", b, b"\r\n"))
+    return b"".join(out)
 
 
 def recv_one(sock):
     return sock.recv(1024)
 
 
+def tune_socket(s):
+    # Nagle plus delayed ACKs stalls pipelined batches for ~40ms per
+    # window; large buffers keep whole batches from blocking in flight.
+    if s.family != socket.AF_UNIX:
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+
+
+def connect(port, timeout=2):
+    if BENCH_SOCK:
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(timeout)
+        s.connect(BENCH_SOCK)
+    else:
+        s = socket.create_connection(("127.0.0.1", port), timeout=timeout)
+    tune_socket(s)
+    return s
+
+
 def wait_conn(port):
     for _ in range(80):
         try:
-            return socket.create_connection(("127.0.0.1", port), timeout=0.2)
+            return connect(port, timeout=0.2)
         except OSError:
             time.sleep(0.1)
     raise RuntimeError("server did not start")
 
 
-def worker(port, payload_fn, duration_sec, results, idx):
-    s = socket.create_connection(("127.0.0.1", port), timeout=2)
-    s.settimeout(2)
+def parse_cores(spec):
+    """Parse a core list like "0,2" or "4-7" into a set of ints."""
+    cores = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cores.update(range(int(lo), int(hi) + 1))
+        else:
+            cores.add(int(part))
+    return cores
+
+
+def set_affinity(pid, spec):
+    """Pin `pid` (0 = this process) to the cores in `spec`, if given."""
+    if not spec:
+        return
+    try:
+        os.sched_setaffinity(pid, parse_cores(spec))
+    except (AttributeError, OSError):
+        pass  # not supported on this platform
+
+
+async def open_conn(port):
+    if BENCH_SOCK:
+        reader, writer = await asyncio.open_unix_connection(BENCH_SOCK)
+    else:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    tune_socket(writer.get_extra_info("socket"))
+    return reader, writer
+
+
+async def drain_replies(reader, want):
+    """Consume `want` RESP replies (+OK, -ERR, :int, or bulk string)."""
+    buf = bytearray()
+    pos = 0
+    seen = 0
+    while seen < want:
+        chunk = await reader.read(65536)
+        if not chunk:
+            raise RuntimeError("server closed connection mid-reply")
+        buf += chunk
+        while seen < want:
+            end = buf.find(b"\r\n", pos)
+            if end < 0:
+                break
+            if buf[pos : pos + 1] == b"$":
+                n = int(buf[pos + 1 : end])
+                total = end + 2 + (0 if n < 0 else n + 2)
+                if len(buf) < total:
+                    break
+                pos = total
+            else:
+                pos = end + 2
+            seen += 1
+        if pos:
+            del buf[:pos]
+            pos = 0
+
+
+async def client_loop(conn, payload, duration_sec, counts, idx):
+    reader, writer, lock = conn
+    batch = payload * PIPELINE
     count = 0
-    payload = payload_fn(idx)
-    start = time.time()
-    while time.time() - start < duration_sec:
-        s.sendall(payload)
-        recv_one(s)
-        count += 1
-    s.close()
-    results[idx] = count
-
-
-def run_case(port, payload_fn, clients, duration_sec):
-    threads = []
-    results = [0] * clients
-    start = time.time()
-    for i in range(clients):
-        t = threading.Thread(target=worker, args=(port, payload_fn, duration_sec, results, i))
-        t.start()
-        threads.append(t)
-    for t in threads:
-        t.join()
-    elapsed = time.time() - start
-    total = sum(results)
+    deadline = time.perf_counter() + duration_sec
+    while time.perf_counter() < deadline:
+        # The lock keeps batches from different logical clients from
+        # interleaving their replies on a shared connection.
+        async with lock:
+            writer.write(batch)
+            await writer.drain()
+            await drain_replies(reader, PIPELINE)
+        count += PIPELINE
+    counts[idx] = count
+
+
+def run_case(port, payloads, clients, duration_sec, conns=None):
+    # One coroutine per logical client on a single event loop, with the
+    # clients multiplexed round-robin over a small pool of connections;
+    # each batch keeps a full pipeline window in flight, so the fan-out
+    # needs neither a thread nor a process per client.
+    if conns is None:
+        conns = CONNS or min(clients, 4)
+    conns = max(min(conns, clients), 1)
+
+    async def runner():
+        pool = []
+        for _ in range(conns):
+            reader, writer = await open_conn(port)
+            pool.append((reader, writer, asyncio.Lock()))
+        counts = [0] * clients
+        tasks = [
+            asyncio.ensure_future(
+                client_loop(pool[i % conns], payloads[i], duration_sec, counts, i)
+            )
+            for i in range(clients)
+        ]
+        await asyncio.gather(*tasks)
+        for _, writer, _ in pool:
+            writer.close()
+        return sum(counts)
+
+    start = time.perf_counter()
+    total = asyncio.run(runner())
+    elapsed = time.perf_counter() - start
     return total / max(elapsed, 0.001)
 
 
+def stop_server(pid):
+    os.kill(pid, signal.SIGTERM)
+    for _ in range(20):
+        done, _ = os.waitpid(pid, os.WNOHANG)
+        if done:
+            return
+        time.sleep(0.1)
+    os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+
+
 def main():
-    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    port = 6411
+    if uvloop is not None:
+        uvloop.install()
+    set_affinity(0, os.environ.get("FEDIS_BENCH_CLIENT_CORES") or os.environ.get("FEDIS_BENCH_AFFINITY"))
+    port = int(os.environ.get("FEDIS_BENCH_PORT", "6411"))
     clients = int(os.environ.get("FEDIS_BENCH_CLIENTS", "16"))
     duration_sec = int(os.environ.get("FEDIS_BENCH_DURATION", "3"))
     mode = os.environ.get("FEDIS_BENCH_MODE", "sharded").strip().lower()
@@ -66,33 +216,49 @@ def main():
     env = os.environ.copy()
     env["FEDIS_PORT"] = str(port)
     env.setdefault("FEDIS_LOG", "error")
+    if BENCH_SOCK:
+        env["FEDIS_SOCK"] = BENCH_SOCK
 
-    proc = subprocess.Popen(["cargo", "run", "--quiet"], cwd=root, env=env)
+    if EXTERNAL:
+        # Attach to an already-running server (see serve.py).
+        pid = None
+    else:
+        # Debug builds are 10-50x slower than release and would measure
+        # the wrong binary; build once, then posix_spawn the binary so
+        # neither cargo nor Popen's fork machinery is on the startup path.
+        subprocess.run(["cargo", "build", "--release", "--quiet"], cwd=ROOT, check=True)
+        bin_path = os.path.join(ROOT, "target", "release", "fedis")
+        pid = os.posix_spawn(bin_path, [bin_path], env)
+        set_affinity(pid, os.environ.get("FEDIS_BENCH_SERVER_CORES"))
     try:
         s = wait_conn(port)
         s.sendall(encode(["SET", "bench:key:0", "0"]))
         recv_one(s)
         s.close()
 
+        # Encode every client's payload up front; the per-client key (or
+        # the shared hot key) never changes, so nothing RESP-related is
+        # left on the timed path.
         if mode == "hotkey":
-            set_payload = lambda _i: encode(["SET", "bench:key:0", "1"])
-            get_payload = lambda _i: encode(["GET", "bench:key:0"])
+            keys = ["bench:key:0"] * clients
         else:
-            set_payload = lambda i: encode(["SET", f"bench:key:{i % max(clients, 1)}", "1"])
-            get_payload = lambda i: encode(["GET", f"bench:key:{i % max(clients, 1)}"])
+            keys = [f"bench:key:{i}" for i in range(clients)]
+        set_payloads = [encode(["SET", key, "1"]) for key in keys]
+        get_payloads = [encode(["GET", key]) for key in keys]
 
-        set_ops = run_case(port, set_payload, clients, duration_sec)
-        get_ops = run_case(port, get_payload, clients, duration_sec)
+        # Warm up connections, caches, and CPU clocks; results discarded.
+        run_case(port, set_payloads, clients, 0.5)
+        set_ops = run_case(port, set_payloads, clients, duration_sec)
+        run_case(port, get_payloads, clients, 0.5)
+        get_ops = run_case(port, get_payloads, clients, duration_sec)
 
-        print(f"clients={clients} duration={duration_sec}s mode={mode}")
+        conns = max(min(CONNS or min(clients, 4), clients), 1)
+        print(f"clients={clients} conns={conns} duration={duration_sec}s mode={mode}")
         print(f"SET ops/sec: {set_ops:.0f}")
         print(f"GET ops/sec: {get_ops:.0f}")
     finally:
-        proc.terminate()
-        try:
-            proc.wait(timeout=2)
-        except subprocess.TimeoutExpired:
-            proc.kill()
+        if pid is not None:
+            stop_server(pid)
 
 
 if __name__ == "__main__":
@@ -1,90 +1,352 @@
 #!/usr/bin/env python3
+import array
 import json
+import multiprocessing
 import os
+import signal
 import socket
 import statistics
 import subprocess
-import threading
 import time
 
+import driver
+
+try:
+    import liburing
+except ImportError:  # optional io_uring-backed client loop
+    liburing = None
+
+try:
+    from hdrhistogram import HdrHistogram
+except ImportError:  # optional constant-memory percentile tracking
+    HdrHistogram = None
+
+# Number of in-flight commands per batch; 1 restores the old
+# send-one-wait-one behaviour for latency-style measurements.
+PIPELINE = max(int(os.environ.get("FEDIS_BENCH_PIPELINE", "64")), 1)
+
+# When set, attach to an already-running server instead of spawning one.
+EXTERNAL = os.environ.get("FEDIS_BENCH_EXTERNAL") == "1"
+
+# When set, benchmark over a Unix domain socket at this path instead
+# of loopback TCP; the server is launched with FEDIS_SOCK to match.
+BENCH_SOCK = os.environ.get("FEDIS_BENCH_SOCK")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+_LEN_CACHE = {}
+
+
+def _len_bytes(n):
+    b = _LEN_CACHE.get(n)
+    if b is None:
+        b = str(n).encode()
+        if n < 1024:
+            _LEN_CACHE[n] = b
+    return b
+
 
 def encode(parts):
-    out = f"*{len(parts)}\r\n".encode()
+    out = [b"*", _len_bytes(len(parts)), b"\r\n"]
     for p in parts:
         b = p if isinstance(p, bytes) else str(p).encode()
-        out += f"${len(b)}\r\n".encode() + b + b"\r\n"
-    return out
+        out.extend((b"$", _len_bytes(len(b)), b"\r\n", b, b"\r\n"))
+    return b"".join(out)
 
 
 def recv_one(sock):
     return sock.recv(1024)
 
 
+def tune_socket(s):
+    # Nagle plus delayed ACKs stalls pipelined batches for ~40ms per
+    # window; large buffers keep whole batches from blocking in flight.
+    if s.family != socket.AF_UNIX:
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+
+
+def connect(port, timeout=2):
+    if BENCH_SOCK:
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(timeout)
+        s.connect(BENCH_SOCK)
+    else:
+        s = socket.create_connection(("127.0.0.1", port), timeout=timeout)
+    tune_socket(s)
+    return s
+
+
 def wait_conn(port):
     for _ in range(80):
         try:
-            return socket.create_connection(("127.0.0.1", port), timeout=0.2)
+            return connect(port, timeout=0.2)
         except OSError:
             time.sleep(0.1)
     raise RuntimeError("server did not start")
 
 
-def run_single(sock, payload, duration_sec):
-    start = time.time()
+def parse_cores(spec):
+    """Parse a core list like "0,2" or "4-7" into a set of ints."""
+    cores = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cores.update(range(int(lo), int(hi) + 1))
+        else:
+            cores.add(int(part))
+    return cores
+
+
+def set_affinity(pid, spec):
+    """Pin `pid` (0 = this process) to the cores in `spec`, if given."""
+    if not spec:
+        return
+    try:
+        os.sched_setaffinity(pid, parse_cores(spec))
+    except (AttributeError, OSError):
+        pass  # not supported on this platform
+
+
+def drain_replies(sock, buf, mv, want):
+    """Consume `want` RESP replies (+OK, -ERR, :int, or bulk string).
+
+    A small state machine carries the parse position across reads: either
+    we are inside a header line (the short tail is kept in `header`) or we
+    are `skip` bytes into a bulk-string body. Each received byte is looked
+    at once and the receive buffer is never compacted.
+    """
+    seen = 0
+    skip = 0  # bytes of the current bulk body (plus CRLF) left to consume
+    header = b""  # partial header line carried over from the last read
+    while seen < want:
+        got = sock.recv_into(mv)
+        if not got:
+            raise RuntimeError("server closed connection mid-reply")
+        pos = 0
+        while pos < got and seen < want:
+            if skip:
+                step = min(skip, got - pos)
+                pos += step
+                skip -= step
+                if skip == 0:
+                    seen += 1
+                continue
+            if header[-1:] == b"\r" and buf[pos : pos + 1] == b"\n":
+                # CRLF split across two reads.
+                line = header[:-1]
+                header = b""
+                pos += 1
+            else:
+                end = buf.find(b"\r\n", pos, got)
+                if end < 0:
+                    header += buf[pos:got]
+                    break
+                line = header + buf[pos:end] if header else buf[pos:end]
+                header = b""
+                pos = end + 2
+            if line[:1] == b"$":
+                n = int(line[1:])
+                if n < 0:
+                    seen += 1  # null bulk has no body
+                else:
+                    skip = n + 2
+            else:
+                seen += 1
+
+
+def run_single(sock, payload, duration_sec, window=PIPELINE):
+    batch = payload * window
+    buf = bytearray(65536)
+    mv = memoryview(buf)
+    # Check the clock roughly every 1024 ops, not on every iteration.
+    checks = max(1024 // window, 1)
+    start = time.perf_counter()
+    deadline = start + duration_sec
     n = 0
-    while time.time() - start < duration_sec:
-        sock.sendall(payload)
-        recv_one(sock)
-        n += 1
-    return n / max(time.time() - start, 0.001)
+    while True:
+        for _ in range(checks):
+            sock.sendall(batch)
+            drain_replies(sock, buf, mv, window)
+        n += checks * window
+        if time.perf_counter() >= deadline:
+            break
+    return n / max(time.perf_counter() - start, 0.001)
+
+
+def run_single_native(lib, sock, payload, reply_len, duration_sec, window=PIPELINE):
+    """run_single with the timed loop in C (driver.c); needs a known
+    fixed reply size so the native loop can read exact byte counts."""
+    batch = payload * window
+    sock.settimeout(None)  # the C loop expects a blocking fd
+    try:
+        start = time.perf_counter()
+        iters = lib.run_fixed(
+            sock.fileno(), batch, len(batch), reply_len * window, int(duration_sec * 1e9)
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        sock.settimeout(2)
+    if iters == 0:
+        raise RuntimeError("native benchmark loop failed")
+    return iters * window / max(elapsed, 0.001)
+
+
+def uring_available():
+    """liburing imports fine on kernels too old to run it, and newer
+    releases of the bindings have renamed parts of the API; check for
+    every name the loop uses, then probe by actually setting up (and
+    tearing down) a ring."""
+    if liburing is None:
+        return False
+    required = (
+        "io_uring",
+        "io_uring_cqe",
+        "iovec",
+        "io_uring_queue_init",
+        "io_uring_queue_exit",
+        "io_uring_get_sqe",
+        "io_uring_prep_send",
+        "io_uring_prep_recv",
+        "io_uring_submit",
+        "io_uring_wait_cqe_nr",
+        "io_uring_cq_advance",
+        "IOSQE_IO_LINK",
+    )
+    if not all(hasattr(liburing, name) for name in required):
+        return False
+    try:
+        ring = liburing.io_uring()
+        liburing.io_uring_queue_init(1, ring, 0)
+        liburing.io_uring_queue_exit(ring)
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+def run_single_uring(sock, payload, reply_len, duration_sec, window=PIPELINE):
+    """run_single with io_uring batched I/O (requires the liburing
+    package and a recent kernel); the send and the full-window recv are
+    linked SQEs, so each batch costs one submit-and-wait instead of a
+    send plus recv syscall pair."""
+    batch = payload * window
+    reply_bytes = reply_len * window
+    send_iov = liburing.iovec(batch)
+    recv_iov = liburing.iovec(bytearray(max(reply_bytes, 4096)))
+    fd = sock.fileno()
+
+    ring = liburing.io_uring()
+    cqe = liburing.io_uring_cqe()
+    liburing.io_uring_queue_init(8, ring, 0)
+    sock.settimeout(None)  # io_uring wants a blocking fd
+    try:
+        start = time.perf_counter()
+        deadline = start + duration_sec
+        n = 0
+        while time.perf_counter() < deadline:
+            sqe = liburing.io_uring_get_sqe(ring)
+            liburing.io_uring_prep_send(
+                sqe, fd, send_iov[0].iov_base, send_iov[0].iov_len, 0
+            )
+            sqe.flags |= liburing.IOSQE_IO_LINK
+            sqe = liburing.io_uring_get_sqe(ring)
+            liburing.io_uring_prep_recv(
+                sqe, fd, recv_iov[0].iov_base, reply_bytes, socket.MSG_WAITALL
+            )
+            liburing.io_uring_submit(ring)
+            liburing.io_uring_wait_cqe_nr(ring, cqe, 2)
+            send_res = cqe[0].res
+            recv_res = cqe[1].res
+            liburing.io_uring_cq_advance(ring, 2)
+            # A short or failed send cancels the linked recv (-ECANCELED);
+            # counting that batch anyway would desync the RESP stream and
+            # inflate the result, so fail loudly like run_single_native.
+            if send_res != len(batch) or recv_res != reply_bytes:
+                raise RuntimeError(
+                    f"io_uring batch failed (send={send_res}, recv={recv_res})"
+                )
+            n += window
+        elapsed = time.perf_counter() - start
+    finally:
+        sock.settimeout(2)
+        liburing.io_uring_queue_exit(ring)
+    return n / max(elapsed, 0.001)
 
 
 def measure_latency_ms(sock, payload, samples):
-    values = []
-    for _ in range(samples):
+    mv = memoryview(bytearray(4096))
+    if HdrHistogram is not None:
+        # Log-bucketed histogram: O(1) recording at 3 significant digits,
+        # no sort at the end. Tracks 1ns..10ms, which covers loopback.
+        hist = HdrHistogram(1, 10_000_000, 3)
+        total_ns = 0
+        for _ in range(samples):
+            t0 = time.perf_counter_ns()
+            sock.sendall(payload)
+            sock.recv_into(mv)
+            dt = time.perf_counter_ns() - t0
+            hist.record_value(dt)
+            total_ns += dt
+        return {
+            "p50_ms": hist.get_value_at_percentile(50) / 1e6,
+            "p95_ms": hist.get_value_at_percentile(95) / 1e6,
+            "p99_ms": hist.get_value_at_percentile(99) / 1e6,
+            "avg_ms": total_ns / samples / 1e6,
+        }
+    # Integer nanoseconds in a preallocated array keep the timed loop
+    # free of per-sample float and list allocations.
+    values = array.array("q", bytes(8 * samples))
+    for i in range(samples):
         t0 = time.perf_counter_ns()
         sock.sendall(payload)
-        recv_one(sock)
-        dt_ms = (time.perf_counter_ns() - t0) / 1_000_000
-        values.append(dt_ms)
-    values.sort()
-    def pct(p):
-        idx = min(len(values) - 1, int(len(values) * p))
-        return values[idx]
+        sock.recv_into(mv)
+        values[i] = time.perf_counter_ns() - t0
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
     return {
-        "p50_ms": pct(0.50),
-        "p95_ms": pct(0.95),
-        "p99_ms": pct(0.99),
-        "avg_ms": statistics.mean(values),
+        "p50_ms": cuts[49] / 1e6,
+        "p95_ms": cuts[94] / 1e6,
+        "p99_ms": cuts[98] / 1e6,
+        "avg_ms": statistics.fmean(values) / 1e6,
     }
 
 
-def worker(port, payload_fn, duration_sec, out, idx):
-    s = socket.create_connection(("127.0.0.1", port), timeout=2)
+def worker(port, payload, duration_sec, out, idx):
+    s = connect(port)
     s.settimeout(2)
-    payload = payload_fn(idx)
+    mv = memoryview(bytearray(4096))
     count = 0
-    start = time.time()
-    while time.time() - start < duration_sec:
-        s.sendall(payload)
-        recv_one(s)
-        count += 1
+    deadline = time.perf_counter() + duration_sec
+    while True:
+        for _ in range(1024):
+            s.sendall(payload)
+            s.recv_into(mv)
+        count += 1024
+        if time.perf_counter() >= deadline:
+            break
     s.close()
     out[idx] = count
 
 
-def run_concurrent(port, payload_fn, clients, duration_sec):
-    out = [0] * clients
-    threads = []
-    start = time.time()
+def run_concurrent(port, payloads, clients, duration_sec):
+    # Fork so workers run on separate cores instead of fighting over the
+    # GIL; forked children inherit the pre-encoded payloads.
+    ctx = multiprocessing.get_context("fork")
+    out = ctx.Array("q", clients, lock=False)
+    procs = []
+    start = time.perf_counter()
     for i in range(clients):
-        t = threading.Thread(target=worker, args=(port, payload_fn, duration_sec, out, i))
-        t.start()
-        threads.append(t)
-    for t in threads:
-        t.join()
+        p = ctx.Process(target=worker, args=(port, payloads[i], duration_sec, out, i))
+        p.start()
+        procs.append(p)
+    for p in procs:
+        p.join()
     total = sum(out)
-    return total / max(time.time() - start, 0.001)
+    return total / max(time.perf_counter() - start, 0.001)
 
 
 def median_runs(fn, runs):
@@ -92,8 +354,19 @@ def median_runs(fn, runs):
     return statistics.median(values), values
 
 
+def stop_server(pid):
+    os.kill(pid, signal.SIGTERM)
+    for _ in range(20):
+        done, _ = os.waitpid(pid, os.WNOHANG)
+        if done:
+            return
+        time.sleep(0.1)
+    os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+
+
 def main():
-    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    set_affinity(0, os.environ.get("FEDIS_BENCH_CLIENT_CORES") or os.environ.get("FEDIS_BENCH_AFFINITY"))
     port = int(os.environ.get("FEDIS_BENCH_PORT", "6412"))
     runs = int(os.environ.get("FEDIS_BENCH_RUNS", "3"))
     duration = int(os.environ.get("FEDIS_BENCH_DURATION", "2"))
@@ -102,7 +375,19 @@ def main():
     env = os.environ.copy()
     env["FEDIS_PORT"] = str(port)
     env.setdefault("FEDIS_LOG", "error")
-    proc = subprocess.Popen(["cargo", "run", "--quiet"], cwd=root, env=env)
+    if BENCH_SOCK:
+        env["FEDIS_SOCK"] = BENCH_SOCK
+    if EXTERNAL:
+        # Attach to an already-running server (see serve.py).
+        pid = None
+    else:
+        # Debug builds are 10-50x slower than release and would measure
+        # the wrong binary; build once, then posix_spawn the binary so
+        # neither cargo nor Popen's fork machinery is on the startup path.
+        subprocess.run(["cargo", "build", "--release", "--quiet"], cwd=ROOT, check=True)
+        bin_path = os.path.join(ROOT, "target", "release", "fedis")
+        pid = os.posix_spawn(bin_path, [bin_path], env)
+        set_affinity(pid, os.environ.get("FEDIS_BENCH_SERVER_CORES"))
 
     try:
         sock = wait_conn(port)
@@ -112,31 +397,41 @@ def main():
         set_payload = encode(["SET", "bench:key", "123"])
         get_payload = encode(["GET", "bench:key"])
         ping_payload = encode(["PING"])
+        # Fixed reply sizes once the key holds "123": +OK\r\n and $3\r\n123\r\n.
+        set_reply_len = len(b"+OK\r\n")
+        get_reply_len = len(b"$3\r\n123\r\n")
+
+        native = driver.load()
+        if uring_available():
+            run_set = lambda d: run_single_uring(sock, set_payload, set_reply_len, d)
+            run_get = lambda d: run_single_uring(sock, get_payload, get_reply_len, d)
+        elif native is not None:
+            run_set = lambda d: run_single_native(native, sock, set_payload, set_reply_len, d)
+            run_get = lambda d: run_single_native(native, sock, get_payload, get_reply_len, d)
+        else:
+            run_set = lambda d: run_single(sock, set_payload, d)
+            run_get = lambda d: run_single(sock, get_payload, d)
 
-        run_single(sock, set_payload, 0.5)
-        run_single(sock, get_payload, 0.5)
+        run_set(0.5)
+        run_get(0.5)
 
-        set_ops, set_samples = median_runs(lambda: run_single(sock, set_payload, duration), runs)
-        get_ops, get_samples = median_runs(lambda: run_single(sock, get_payload, duration), runs)
-        ping_lat = measure_latency_ms(sock, ping_payload, 200)
+        set_ops, set_samples = median_runs(lambda: run_set(duration), runs)
+        get_ops, get_samples = median_runs(lambda: run_get(duration), runs)
+        ping_lat = measure_latency_ms(sock, ping_payload, 5000)
         sock.close()
 
+        c_set_payloads = [encode(["SET", f"bench:key:{i}", "1"]) for i in range(clients)]
+        c_get_payloads = [encode(["GET", f"bench:key:{i}"]) for i in range(clients)]
+
+        # Warm up connections, caches, and CPU clocks; results discarded.
+        run_concurrent(port, c_set_payloads, clients, 0.5)
+
         c_set, c_set_samples = median_runs(
-            lambda: run_concurrent(
-                port,
-                lambda i: encode(["SET", f"bench:key:{i % max(clients, 1)}", "1"]),
-                clients,
-                duration,
-            ),
+            lambda: run_concurrent(port, c_set_payloads, clients, duration),
             runs,
         )
         c_get, c_get_samples = median_runs(
-            lambda: run_concurrent(
-                port,
-                lambda i: encode(["GET", f"bench:key:{i % max(clients, 1)}"]),
-                clients,
-                duration,
-            ),
+            lambda: run_concurrent(port, c_get_payloads, clients, duration),
             runs,
         )
 
@@ -157,18 +452,15 @@ def main():
             },
         }
 
-        out_path = os.path.join(root, "benchmarks", "latest_results.json")
+        out_path = os.path.join(ROOT, "benchmarks", "latest_results.json")
         with open(out_path, "w", encoding="utf-8") as f:
             json.dump(result, f, indent=2)
 
         print(json.dumps(result, indent=2))
         print(f"saved: {out_path}")
     finally:
-        proc.terminate()
-        try:
-            proc.wait(timeout=2)
-        except subprocess.TimeoutExpired:
-            proc.kill()
+        if pid is not None:
+            stop_server(pid)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Run one fedis server for several benchmark invocations.
+
+Spawning cargo per script costs seconds of startup in CI and leaves each
+run with a differently warmed server. Launch this once, then point the
+benchmark scripts at it with FEDIS_BENCH_EXTERNAL=1:
+
+    python3 benchmarks/serve.py &
+    FEDIS_BENCH_EXTERNAL=1 FEDIS_BENCH_PORT=6412 python3 benchmarks/run_suite.py
+    FEDIS_BENCH_EXTERNAL=1 python3 benchmarks/check_regression.py
+"""
+import os
+import signal
+import subprocess
+
+BENCH_SOCK = os.environ.get("FEDIS_BENCH_SOCK")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    env = os.environ.copy()
+    env.setdefault("FEDIS_PORT", os.environ.get("FEDIS_BENCH_PORT", "6412"))
+    env.setdefault("FEDIS_LOG", "error")
+    if BENCH_SOCK:
+        env["FEDIS_SOCK"] = BENCH_SOCK
+
+    subprocess.run(["cargo", "build", "--release", "--quiet"], cwd=ROOT, check=True)
+    bin_path = os.path.join(ROOT, "target", "release", "fedis")
+    pid = os.posix_spawn(bin_path, [bin_path], env)
+    print(f"fedis serving on port {env['FEDIS_PORT']} (pid {pid})")
+    try:
+        os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ use crate::persistence::AofFsync;
 #[derive(Clone)]
 pub struct Config {
     pub listen_addr: String,
+    pub unix_socket_path: Option<PathBuf>,
     pub aof_path: PathBuf,
     pub users: HashMap<String, User>,
     pub default_user: String,
@@ -155,6 +156,7 @@ impl Config {
             .map(parse_u64)
             .transpose()?;
         let metrics_addr = setting("FEDIS_METRICS_ADDR");
+        let unix_socket_path = setting("FEDIS_SOCK").map(PathBuf::from);
 
         if let Some(path) = &snapshot_path {
             if let Some(parent) = path.parent() {
@@ -164,6 +166,7 @@ impl Config {
 
         Ok(Self {
             listen_addr,
+            unix_socket_path,
             aof_path,
             users,
             default_user,
@@ -3,8 +3,8 @@ use std::sync::atomic::{AtomicU64, Ordering};
 use std::time::Duration;
 use std::time::Instant;
 
-use tokio::io::{AsyncWriteExt, BufReader};
-use tokio::net::{TcpListener, TcpStream};
+use tokio::io::{AsyncRead, AsyncWrite, AsyncWriteExt, BufReader};
+use tokio::net::{TcpListener, UnixListener, UnixStream};
 use tokio::sync::Semaphore;
 use tracing::{debug, info, warn};
 
@@ -55,6 +55,16 @@ impl Server {
             "server started"
         );
 
+        let unix_listener = match &self.config.unix_socket_path {
+            Some(path) => {
+                let _ = std::fs::remove_file(path);
+                let unix_listener = UnixListener::bind(path)?;
+                info!(unix_socket = %path.display(), "unix socket listener started");
+                Some(unix_listener)
+            }
+            None => None,
+        };
+
         if self.config.debug_response_ids && !self.config.non_redis_mode {
             warn!(
                 "FEDIS_DEBUG_RESPONSE_ID is enabled but FEDIS_NON_REDIS_MODE is off; response IDs are disabled"
@@ -103,15 +113,23 @@ impl Server {
         let mut shutdown = std::pin::pin!(tokio::signal::ctrl_c());
         let limit = Arc::new(Semaphore::new(self.config.max_connections.max(1)));
         loop {
-            let accept_result = tokio::select! {
+            let (socket, peer_addr): (Box<dyn ClientStream>, String) = tokio::select! {
                 _ = &mut shutdown => {
                     info!("shutdown signal received");
                     break;
                 }
-                accepted = listener.accept() => accepted,
+                accepted = listener.accept() => {
+                    let (socket, peer_addr) = accepted?;
+                    // Replies are small; without this Nagle holds them back waiting
+                    // for delayed ACKs, which stalls pipelining clients.
+                    let _ = socket.set_nodelay(true);
+                    (Box::new(socket), peer_addr.to_string())
+                }
+                accepted = accept_unix(&unix_listener) => {
+                    (Box::new(accepted?), "unix".to_string())
+                }
             };
 
-            let (socket, peer_addr) = accept_result?;
             let Ok(permit) = limit.clone().try_acquire_owned() else {
                 warn!(peer = %peer_addr, "connection rejected: max connections reached");
                 let mut socket = socket;
@@ -133,7 +151,7 @@ impl Server {
                     socket,
                     executor,
                     connection_id,
-                    peer_addr,
+                    peer_addr.clone(),
                     with_response_ids,
                     max_request_bytes,
                     idle_timeout,
@@ -153,6 +171,17 @@ impl Server {
     }
 }
 
+trait ClientStream: AsyncRead + AsyncWrite + Unpin + Send {}
+
+impl<T: AsyncRead + AsyncWrite + Unpin + Send> ClientStream for T {}
+
+async fn accept_unix(listener: &Option<UnixListener>) -> std::io::Result<UnixStream> {
+    match listener {
+        Some(listener) => listener.accept().await.map(|(socket, _)| socket),
+        None => std::future::pending().await,
+    }
+}
+
 async fn run_metrics_server(
     metrics_addr: String,
     stats: Arc<ServerStats>,
@@ -261,15 +290,15 @@ async fn format_metrics(stats: &ServerStats, store: &Store) -> String {
 }
 
 async fn handle_client(
-    socket: TcpStream,
+    socket: Box<dyn ClientStream>,
     executor: Arc<CommandExecutor>,
     connection_id: u64,
-    peer_addr: std::net::SocketAddr,
+    peer_addr: String,
     with_response_ids: bool,
     max_request_bytes: usize,
     idle_timeout: Duration,
 ) -> Result<(), Box<dyn std::error::Error>> {
-    let (reader_half, writer_half) = socket.into_split();
+    let (reader_half, writer_half) = tokio::io::split(socket);
     let mut reader = BufReader::new(reader_half);
     let mut writer = writer_half;
     let mut session = SessionAuth::default();